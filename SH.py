@@ -70,121 +70,191 @@ import warnings
 
 # POINTS NEED TO BE PRESENTED CLOCKWISE OR ELSE THIS WONT WORK
 
+_EMPTY_WARNING = ("No intersections found. Are you sure your polygon "
+                  "coordinates are in clockwise order?")
+
 class PolygonClipper:
     
-    def __init__(self,warn_if_empty=True):
+    def __init__(self,warn_if_empty=True,dtype=np.float32):
         self.warn_if_empty = warn_if_empty
+        
+        # the floating point type used for clipping. Single precision is
+        # enough for most polygons and halves the memory traffic, but
+        # np.float64 can be used if more precision is needed
+        self.dtype = dtype
     
-    def is_inside(self,p1,p2,q):
-        R = (p2[0] - p1[0]) * (q[1] - p1[1]) - (p2[1] - p1[1]) * (q[0] - p1[0])
-        if R <= 0:
-            return True
-        else:
-            return False
+    def cross_soa(self,cx1,cy1,cx2,cy2,xs,ys):
+        # the points are given as separate arrays of x- and y-coordinates, and
+        # an array with the value of R for each point is returned. A point is
+        # inside the clipping polygon if R <= 0
+        return (cx2 - cx1) * (ys - cy1) - (cy2 - cy1) * (xs - cx1)
 
-    def compute_intersection(self,p1,p2,p3,p4):
+    def signed_distances(self,clipping_polygon,xs,ys):
+        # the value of R given by cross_soa for every pair of an edge of the
+        # clipping polygon and a vertex of the subject polygon, computed at
+        # once by broadcasting. Row i corresponds to the clipping edge from
+        # vertex i - 1 to vertex i, so this is a K x N array
+        c_start = np.roll(clipping_polygon,1,axis=0)
+        ex = clipping_polygon[:,0] - c_start[:,0]
+        ey = clipping_polygon[:,1] - c_start[:,1]
+        
+        return ex[:,None] * (ys[None,:] - c_start[:,1,None]) - ey[:,None] * (xs[None,:] - c_start[:,0,None])
+    
+    def intersect_soa(self,xs,ys,R,j_start,j_end):
         
         """
-        given points p1 and p2 on line L1, compute the equation of L1 in the
-        format of y = m1 * x + b1. Also, given points p3 and p4 on line L2,
-        compute the equation of L2 in the format of y = m2 * x + b2.
+        compute the points of intersection of the subject edges from the
+        vertices j_start to the vertices j_end with a clipping edge, given the
+        values of R of all the vertices for that clipping edge.
+        
+        R is proportional to the signed distance of a point from the line
+        through the clipping edge, and it changes linearly along a subject
+        edge. If the points on the subject edge are written as
+        
+        p(t) = p_start + t * (p_end - p_start)
         
-        To compute the point of intersection of the two lines, equate
-        the two line equations together
+        then p(t) is on the line where R(t) = R_start + t * (R_end - R_start)
+        is zero, so
         
-        m1 * x + b1 = m2 * x + b2
+        t = R_start / (R_start - R_end)
         
-        and solve for x. Once x is obtained, substitute it into one of the
-        equations to obtain the value of y.
+        this gives the same point as the determinant form given here:
         
-        if one of the lines is vertical, then the x-coordinate of the point of
-        intersection will be the x-coordinate of the vertical line. Note that
-        there is no need to check if both lines are vertical (parallel), since
-        this function is only called if we know that the lines intersect.
+        https://en.wikipedia.org/wiki/Line%E2%80%93line_intersection#Given_two_points_on_each_line
+        
+        but reuses the values of R that were already computed to check which
+        vertices are inside the clipping polygon. Since this function is only
+        called for subject edges that cross the clipping edge, R_start and
+        R_end have different signs, so the denominator is never zero.
         """
         
-        # if first line is vertical
-        if p2[0] - p1[0] == 0:
-            x = p1[0]
-            
-            # slope and intercept of second line
-            m2 = (p4[1] - p3[1]) / (p4[0] - p3[0])
-            b2 = p3[1] - m2 * p3[0]
-            
-            # y-coordinate of intersection
-            y = m2 * x + b2
+        t = R[j_start] / (R[j_start] - R[j_end])
         
-        # if second line is vertical
-        elif p4[0] - p3[0] == 0:
-            x = p3[0]
-            
-            # slope and intercept of first line
-            m1 = (p2[1] - p1[1]) / (p2[0] - p1[0])
-            b1 = p1[1] - m1 * p1[0]
-            
-            # y-coordinate of intersection
-            y = m1 * x + b1
+        return xs[j_start] + t * (xs[j_end] - xs[j_start]),ys[j_start] + t * (ys[j_end] - ys[j_start])
+    
+    def _next_buffer(self,buffers,i,n):
+        # the vertices of the clipped polygon are written into two
+        # preallocated 2 x cap buffers, with the x-coordinates in the first
+        # row and the y-coordinates in the second row. The output of the
+        # i-th clipping edge is written into one buffer while the other
+        # buffer is read from. Clipping against a single edge at most doubles
+        # the number of vertices n, so grow the buffer if needed
+        out = buffers[i % 2]
+        if out.shape[1] < 2 * n:
+            out = buffers[i % 2] = np.empty((2,2 * n),dtype=out.dtype)
+        return out
+    
+    def _clip_edge(self,xs,ys,R,out):
+        # clip the subject polygon with vertices (xs,ys) against a single edge
+        # of the clipping polygon, given the values of R of the vertices for
+        # that edge. The vertices of the clipped polygon are written into the
+        # buffer out, and views of them are returned
+        inside = R <= 0
         
-        # if neither line is vertical
-        else:
-            m1 = (p2[1] - p1[1]) / (p2[0] - p1[0])
-            b1 = p1[1] - m1 * p1[0]
-            
-            # slope and intercept of second line
-            m2 = (p4[1] - p3[1]) / (p4[0] - p3[0])
-            b2 = p3[1] - m2 * p3[0]
+        # since the subject edge ending at vertex j starts at vertex j - 1,
+        # inside_start[j] tells us if the start of that edge is inside the
+        # clipping polygon. This is inside shifted by one, built directly
+        # from two slices rather than with np.roll
+        inside_start = np.empty_like(inside)
+        inside_start[1:] = inside[:-1]
+        inside_start[:1] = inside[-1:]
+        
+        # the subject edges that cross the clipping edge. These are the
+        # only edges for which a point of intersection is saved
+        crossing = inside != inside_start
         
-            # x-coordinate of intersection
-            x = (b2 - b1) / (m1 - m2)
+        # each subject edge saves the point of intersection first (if it
+        # crosses the clipping edge) and then its end vertex (if it is
+        # inside the clipping polygon), so the index of the first saved
+        # point of each edge is the number of points saved before it
+        counts = crossing.astype(np.intp) + inside
+        offsets = np.cumsum(counts) - counts
         
-            # y-coordinate of intersection
-            y = m1 * x + b1
+        # stores the vertices of the final clipped polygon
+        n_out = counts.sum()
+        out_xs = out[0,:n_out]
+        out_ys = out[1,:n_out]
         
-        intersection = (x,y)
+        # save all vertices that are inside the clipping polygon at once
+        idx = offsets[inside] + crossing[inside]
+        out_xs[idx] = xs[inside]
+        out_ys[idx] = ys[inside]
         
-        return intersection
+        # compute the points of intersection of all the subject edges that
+        # cross the clipping edge at once. Edge j goes from vertex j - 1
+        # to vertex j, where j - 1 = -1 wraps around to the last vertex
+        j = np.flatnonzero(crossing)
+        out_xs[offsets[j]],out_ys[offsets[j]] = self.intersect_soa(xs,ys,R,j - 1,j)
+        
+        return out_xs,out_ys
     
     def clip(self,subject_polygon,clipping_polygon):
         
-        final_polygon = subject_polygon.copy()
+        subject_polygon = np.ascontiguousarray(subject_polygon,dtype=self.dtype)
+        clipping_polygon = np.ascontiguousarray(clipping_polygon,dtype=self.dtype)
         
-        for i in range(len(clipping_polygon)):
-            
-            # stores the vertices of the next iteration of the clipping procedure
-            next_polygon = final_polygon.copy()
-            
-            # stores the vertices of the final clipped polygon
-            final_polygon = []
+        # the vertices are stored as two separate arrays of x- and
+        # y-coordinates, so that every pass over one axis reads one
+        # contiguous array. The subject polygon is copied into the buffer
+        # that is read from by the first clipping edge
+        N = len(subject_polygon)
+        K = len(clipping_polygon)
+        cap = 2 * max(N,K)
+        buffers = [np.empty((2,cap),dtype=self.dtype),np.empty((2,cap),dtype=self.dtype)]
+        buffers[1][:,:N] = subject_polygon.T
+        xs = buffers[1][0,:N]
+        ys = buffers[1][1,:N]
+        
+        # for large polygons, compare the bounding boxes of the two polygons
+        # before running the algorithm. Every vertex of the clipped polygon
+        # lies inside both bounding boxes, so if they do not overlap, then
+        # nothing is left after clipping. This takes a few microseconds, so
+        # it is only worth it if it can save computing the K x N array below
+        if N * K >= 16384:
+            cxs = clipping_polygon[:,0]
+            cys = clipping_polygon[:,1]
+            if xs.max() < cxs.min() or xs.min() > cxs.max() or \
+               ys.max() < cys.min() or ys.min() > cys.max():
+                return np.empty((0,2),dtype=self.dtype)
+        
+        # check which vertices of the subject polygon are inside each edge
+        # of the clipping polygon all at once. If all of them are inside all
+        # the edges, then nothing is clipped. If all of them are outside one
+        # of the edges, then so is every point of the subject polygon, and
+        # nothing is left after clipping
+        R_all = self.signed_distances(clipping_polygon,xs,ys)
+        inside_all = R_all <= 0
+        if inside_all.all():
+            return subject_polygon.copy()
+        if (~inside_all).all(axis=1).any():
+            return np.empty((0,2),dtype=self.dtype)
+        
+        for i in range(K):
             
             # these two vertices define a line segment (edge) in the clipping
             # polygon. It is assumed that indices wrap around, such that if
             # i = 1, then i - 1 = K.
-            c_edge_start = clipping_polygon[i - 1]
-            c_edge_end = clipping_polygon[i]
+            cx1,cy1 = clipping_polygon[i - 1]
+            cx2,cy2 = clipping_polygon[i]
             
-            for j in range(len(next_polygon)):
-                
-                # these two vertices define a line segment (edge) in the subject
-                # polygon
-                s_edge_start = next_polygon[j - 1]
-                s_edge_end = next_polygon[j]
-                
-                if self.is_inside(c_edge_start,c_edge_end,s_edge_end):
-                    if not self.is_inside(c_edge_start,c_edge_end,s_edge_start):
-                        intersection = self.compute_intersection(s_edge_start,s_edge_end,c_edge_start,c_edge_end)
-                        final_polygon.append(intersection)
-                    final_polygon.append(tuple(s_edge_end))
-                elif self.is_inside(c_edge_start,c_edge_end,s_edge_start):
-                    intersection = self.compute_intersection(s_edge_start,s_edge_end,c_edge_start,c_edge_end)
-                    final_polygon.append(intersection)
-        
-        return np.asarray(final_polygon)
+            # check which vertices of the subject polygon are inside the
+            # clipping polygon all at once. This was already done above for
+            # the first edge, but the vertices change after every edge
+            if i == 0:
+                R = R_all[0]
+            else:
+                R = self.cross_soa(cx1,cy1,cx2,cy2,xs,ys)
+            
+            # the output of this iteration is the input of the next one
+            out = self._next_buffer(buffers,i,len(xs))
+            xs,ys = self._clip_edge(xs,ys,R,out)
+        
+        return np.column_stack((xs,ys))
     
     def __call__(self,A,B):
         clipped_polygon = self.clip(A,B)
-        if len(clipped_polygon) == 0 and self.warn_if_empty:
-            warnings.warn("No intersections found. Are you sure your \
-                          polygon coordinates are in clockwise order?")
+        if clipped_polygon.shape[0] == 0 and self.warn_if_empty:
+            warnings.warn(_EMPTY_WARNING,stacklevel=2)
         
         return clipped_polygon
 
@@ -0,0 +1,170 @@
+# cython: language_level=3
+"""
+Cython implementation of the Sutherland-Hodgman algorithm, for when Numba
+is not available. The algorithm is the same as the one in SH.py (see the
+docstring there for an explanation) and the clipping loop is the same as the
+one in SH_numba.py, but it is compiled ahead of time to C. Build it with
+
+cythonize -i SH_cython.pyx
+
+The vertices of the clipped polygon are written into two C buffers. The
+output of clipping against one edge of the clipping polygon is written into
+one buffer while the other buffer is read from, and the two buffers are
+swapped before moving on to the next edge of the clipping polygon.
+"""
+
+import numpy as np
+import warnings
+
+cimport cython
+from cpython.mem cimport PyMem_Malloc, PyMem_Realloc, PyMem_Free
+
+# POINTS NEED TO BE PRESENTED CLOCKWISE OR ELSE THIS WONT WORK
+
+_EMPTY_WARNING = ("No intersections found. Are you sure your polygon "
+                  "coordinates are in clockwise order?")
+
+cdef inline double _cross(double c1x,double c1y,double cdx,double cdy,
+                         double qx,double qy) noexcept nogil:
+    # (cdx,cdy) is the direction of the clipping edge starting at (c1x,c1y).
+    # The point q is inside the clipping polygon if R <= 0
+    return cdx * (qy - c1y) - cdy * (qx - c1x)
+
+@cython.cdivision(True)
+cdef inline void _intersect(double s1x,double s1y,double s2x,double s2y,
+                            double r1,double r2,
+                            double *x,double *y) noexcept nogil:
+    # see _intersect in SH_numba.py. The point of intersection is written
+    # to x and y
+    cdef double t = r1 / (r1 - r2)
+    x[0] = s1x + t * (s2x - s1x)
+    y[0] = s1y + t * (s2y - s1y)
+
+@cython.boundscheck(False)
+@cython.wraparound(False)
+@cython.cdivision(True)
+def sh_clip(double[:,::1] subject,double[:,::1] clip):
+
+    cdef Py_ssize_t N = subject.shape[0]
+    cdef Py_ssize_t K = clip.shape[0]
+    cdef Py_ssize_t cap = 2 * max(N,K) + 4
+    cdef Py_ssize_t n_in = N
+    cdef Py_ssize_t n_out,i,j
+    cdef double c1x,c1y,cdx,cdy,s1x,s1y,s2x,s2y,r1,r2
+    cdef double *buf_a
+    cdef double *buf_b
+    cdef double *tmp
+    cdef double[:,::1] out
+
+    # each buffer stores the vertices as x_1,y_1,x_2,y_2,...
+    buf_a = <double *> PyMem_Malloc(2 * cap * sizeof(double))
+    buf_b = <double *> PyMem_Malloc(2 * cap * sizeof(double))
+    if buf_a == NULL or buf_b == NULL:
+        PyMem_Free(buf_a)
+        PyMem_Free(buf_b)
+        raise MemoryError()
+
+    try:
+        for j in range(N):
+            buf_a[2 * j] = subject[j,0]
+            buf_a[2 * j + 1] = subject[j,1]
+
+        for i in range(K):
+
+            # nothing left to clip
+            if n_in == 0:
+                break
+
+            # clipping against a single edge at most doubles the number of
+            # vertices, so grow both buffers if this could overflow them
+            if 2 * n_in > cap:
+                cap = 2 * n_in
+                tmp = <double *> PyMem_Realloc(buf_a,2 * cap * sizeof(double))
+                if tmp == NULL:
+                    raise MemoryError()
+                buf_a = tmp
+                tmp = <double *> PyMem_Realloc(buf_b,2 * cap * sizeof(double))
+                if tmp == NULL:
+                    raise MemoryError()
+                buf_b = tmp
+
+            with nogil:
+
+                # these two vertices define a line segment (edge) in the
+                # clipping polygon. Indices wrap around, such that if i = 0,
+                # then i - 1 = K - 1.
+                c1x = clip[(i - 1 + K) % K,0]
+                c1y = clip[(i - 1 + K) % K,1]
+                cdx = clip[i,0] - c1x
+                cdy = clip[i,1] - c1y
+
+                # the start of the first subject edge is the last vertex
+                s1x = buf_a[2 * (n_in - 1)]
+                s1y = buf_a[2 * (n_in - 1) + 1]
+                r1 = _cross(c1x,c1y,cdx,cdy,s1x,s1y)
+
+                n_out = 0
+
+                for j in range(n_in):
+
+                    s2x = buf_a[2 * j]
+                    s2y = buf_a[2 * j + 1]
+                    r2 = _cross(c1x,c1y,cdx,cdy,s2x,s2y)
+
+                    if r2 <= 0:
+                        if r1 > 0:
+                            _intersect(s1x,s1y,s2x,s2y,r1,r2,
+                                       &buf_b[2 * n_out],&buf_b[2 * n_out + 1])
+                            n_out += 1
+                        buf_b[2 * n_out] = s2x
+                        buf_b[2 * n_out + 1] = s2y
+                        n_out += 1
+                    elif r1 <= 0:
+                        _intersect(s1x,s1y,s2x,s2y,r1,r2,
+                                   &buf_b[2 * n_out],&buf_b[2 * n_out + 1])
+                        n_out += 1
+
+                    # the end of this subject edge is the start of the next one
+                    s1x = s2x
+                    s1y = s2y
+                    r1 = r2
+
+                # the output of this iteration is the input of the next one
+                tmp = buf_a
+                buf_a = buf_b
+                buf_b = tmp
+                n_in = n_out
+
+        clipped_polygon = np.empty((n_in,2))
+        out = clipped_polygon
+        for j in range(n_in):
+            out[j,0] = buf_a[2 * j]
+            out[j,1] = buf_a[2 * j + 1]
+
+    finally:
+        PyMem_Free(buf_a)
+        PyMem_Free(buf_b)
+
+    return clipped_polygon
+
+def clip(subject_polygon,clipping_polygon):
+    # sh_clip only accepts C-contiguous N x 2 and K x 2 float64 arrays
+    subject_polygon = np.ascontiguousarray(subject_polygon,dtype=np.float64)
+    clipping_polygon = np.ascontiguousarray(clipping_polygon,dtype=np.float64)
+
+    return sh_clip(subject_polygon,clipping_polygon)
+
+class PolygonClipper:
+
+    def __init__(self,warn_if_empty=True):
+        self.warn_if_empty = warn_if_empty
+
+    def clip(self,subject_polygon,clipping_polygon):
+        return clip(subject_polygon,clipping_polygon)
+
+    def __call__(self,A,B):
+        clipped_polygon = self.clip(A,B)
+        if clipped_polygon.shape[0] == 0 and self.warn_if_empty:
+            warnings.warn(_EMPTY_WARNING,stacklevel=2)
+
+        return clipped_polygon
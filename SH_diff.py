@@ -3,78 +3,47 @@ import warnings
 
 # POINTS NEED TO BE PRESENTED CLOCKWISE OR ELSE THIS WONT WORK
 
+_EMPTY_WARNING = ("No intersections found. Are you sure your polygon "
+                  "coordinates are in clockwise order?")
+
 class PolygonClipper:
     
     def __init__(self,warn_if_empty=True):
         self.warn_if_empty = warn_if_empty
     
     def is_inside(self,p1,p2,q):
-        R = (p2[0] - p1[0]) * (q[1] - p1[1]) - (p2[1] - p1[1]) * (q[0] - p1[0])
-        if R <= 0:
-            return True
-        else:
-            return False
+        # q can be a single point or an M x 2 tensor of points, in which case
+        # a boolean tensor of length M is returned
+        R = (p2[0] - p1[0]) * (q[...,1] - p1[1]) - (p2[1] - p1[1]) * (q[...,0] - p1[0])
+        return R <= 0
     
     def compute_intersection(self,p1,p2,p3,p4):
         
         """
-        given points p1 and p2 on line L1, compute the equation of L1 in the
-        format of y = m1 * x + b1. Also, given points p3 and p4 on line L2,
-        compute the equation of L2 in the format of y = m2 * x + b2.
-        
-        To compute the point of intersection of the two lines, equate
-        the two line equations together
+        given points p1 and p2 on line L1 and points p3 and p4 on line L2,
+        write the points on L1 as p1 + t * (p2 - p1) and solve for the value
+        of t at which L1 meets L2. This is the determinant form given here:
         
-        m1 * x + b1 = m2 * x + b2
+        https://en.wikipedia.org/wiki/Line%E2%80%93line_intersection#Given_two_points_on_each_line
         
-        and solve for x. Once x is obtained, substitute it into one of the
-        equations to obtain the value of y.    
-        
-        if one of the lines is vertical, then the x-coordinate of the point of
-        intersection will be the x-coordinate of the vertical line. Note that
-        there is no need to check if both lines are vertical (parallel), since
-        this function is only called if we know that the lines intersect.
+        unlike the slope-intercept form, there is no need to treat vertical
+        lines separately, so the point of intersection is always given by
+        the same differentiable expression. There is also no need to check
+        if the lines are parallel, since this function is only called if we
+        know that the lines intersect.
         """
         
-        # if first line is vertical
-        if p2[0] - p1[0] == 0:
-            x = p1[0]
-            
-            # slope and intercept of second line
-            m2 = (p4[1] - p3[1]) / (p4[0] - p3[0])
-            b2 = p3[1] - m2 * p3[0]
-            
-            # y-coordinate of intersection
-            y = m2 * x + b2
-        
-        # if second line is vertical
-        elif p4[0] - p3[0] == 0:
-            x = p3[0]
-            
-            # slope and intercept of first line
-            m1 = (p2[1] - p1[1]) / (p2[0] - p1[0])
-            b1 = p1[1] - m1 * p1[0]
-            
-            # y-coordinate of intersection
-            y = m1 * x + b1
-        
-        # if neither line is vertical
-        else:
-            m1 = (p2[1] - p1[1]) / (p2[0] - p1[0])
-            b1 = p1[1] - m1 * p1[0]
-            
-            # slope and intercept of second line
-            m2 = (p4[1] - p3[1]) / (p4[0] - p3[0])
-            b2 = p3[1] - m2 * p3[0]
-        
-            # x-coordinate of intersection
-            x = (b2 - b1) / (m1 - m2)
-        
-            # y-coordinate of intersection
-            y = m1 * x + b1
+        return self._intersect(p1,p2 - p1,p3,p4 - p3)
+    
+    def _intersect(self,p1,r,p3,s):
+        # same as compute_intersection, but given the direction r = p2 - p1
+        # of L1 and s = p4 - p3 of L2, so that clip can compute the direction
+        # of each clipping edge once and reuse it for every subject edge
+        den = r[0] * s[1] - r[1] * s[0]
+        t = ((p3[0] - p1[0]) * s[1] - (p3[1] - p1[1]) * s[0]) / den
         
         # need to unsqueeze so torch.cat doesn't complain outside func
-        intersection = torch.stack((x,y)).unsqueeze(0)
+        intersection = (p1 + t * r).unsqueeze(0)
         
         return intersection
     
@@ -88,42 +57,59 @@ class PolygonClipper:
         for i in range(len(clipping_polygon)):
             
             # stores the vertices of the next iteration of the clipping procedure
-            # final_polygon consists of list of 1 x 2 tensors 
-            next_polygon = torch.clone(final_polygon)
+            next_polygon = final_polygon
             
-            # stores the vertices of the final clipped polygon. This will be
-            # a K x 2 tensor, so need to initialize shape to match this
-            final_polygon = torch.empty((0,2))
+            # stores the vertices of the final clipped polygon as a list of
+            # 1 x 2 tensors. These are concatenated once after all subject
+            # edges have been visited, rather than calling torch.cat for
+            # every saved vertex
+            rows = []
             
             # these two vertices define a line segment (edge) in the clipping
             # polygon. It is assumed that indices wrap around, such that if
             # i = 0, then i - 1 = M.
             c_edge_start = clipping_polygon[i - 1]
             c_edge_end = clipping_polygon[i]
+            c_edge_delta = c_edge_end - c_edge_start
+            
+            # check which vertices of the subject polygon are inside the
+            # clipping polygon all at once. Only the coordinates need
+            # gradients, so this is done without tracking gradients and the
+            # result is converted to a list of Python bools
+            with torch.no_grad():
+                inside = self.is_inside(c_edge_start,c_edge_end,next_polygon).tolist()
             
-            for j in range(len(next_polygon)):
+            # split the subject polygon into its vertices once, rather than
+            # indexing next_polygon twice for every subject edge. Each vertex
+            # is the end of one subject edge and the start of the next one
+            vertices = next_polygon.unbind(0)
+            
+            for j in range(len(vertices)):
                 
                 # these two vertices define a line segment (edge) in the subject
                 # polygon
-                s_edge_start = next_polygon[j - 1]
-                s_edge_end = next_polygon[j]
+                s_edge_start = vertices[j - 1]
+                s_edge_end = vertices[j]
                 
-                if self.is_inside(c_edge_start,c_edge_end,s_edge_end):
-                    if not self.is_inside(c_edge_start,c_edge_end,s_edge_start):
-                        intersection = self.compute_intersection(s_edge_start,s_edge_end,c_edge_start,c_edge_end)
-                        final_polygon = torch.cat((final_polygon,intersection),dim=0)
-                    final_polygon = torch.cat((final_polygon,s_edge_end.unsqueeze(0)),dim=0)
-                elif self.is_inside(c_edge_start,c_edge_end,s_edge_start):
-                    intersection = self.compute_intersection(s_edge_start,s_edge_end,c_edge_start,c_edge_end)
-                    final_polygon = torch.cat((final_polygon,intersection),dim=0)
+                if inside[j]:
+                    if not inside[j - 1]:
+                        intersection = self._intersect(s_edge_start,s_edge_end - s_edge_start,c_edge_start,c_edge_delta)
+                        rows.append(intersection)
+                    rows.append(s_edge_end.unsqueeze(0))
+                elif inside[j - 1]:
+                    intersection = self._intersect(s_edge_start,s_edge_end - s_edge_start,c_edge_start,c_edge_delta)
+                    rows.append(intersection)
+            
+            # this will be a K x 2 tensor, so need to initialize shape to
+            # match this if no vertices were saved
+            final_polygon = torch.cat(rows,dim=0) if rows else torch.empty((0,2))
         
         return final_polygon
     
     def __call__(self,A,B):
         clipped_polygon = self.clip(A,B)
-        if len(clipped_polygon) == 0 and self.warn_if_empty:
-            warnings.warn("No intersections found. Are you sure your \
-                          polygon coordinates are in clockwise order?")
+        if clipped_polygon.shape[0] == 0 and self.warn_if_empty:
+            warnings.warn(_EMPTY_WARNING,stacklevel=2)
         
         return clipped_polygon
 
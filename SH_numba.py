@@ -0,0 +1,263 @@
+"""
+Numba implementation of the Sutherland-Hodgman algorithm. The algorithm is
+the same as the one in SH.py (see the docstring there for an explanation),
+but the whole clipping procedure is compiled to machine code by Numba.
+
+Instead of building the clipped polygon with lists of tuples, the vertices
+are written into two preallocated M x 2 buffers. The output of clipping
+against one edge of the clipping polygon is written into one buffer while
+the other buffer is read from, and the two buffers are swapped before moving
+on to the next edge of the clipping polygon.
+"""
+
+import numpy as np
+import warnings
+from numba import njit,prange
+
+# POINTS NEED TO BE PRESENTED CLOCKWISE OR ELSE THIS WONT WORK
+
+_EMPTY_WARNING = ("No intersections found. Are you sure your polygon "
+                  "coordinates are in clockwise order?")
+
+@njit(cache=True,fastmath=True,inline='always')
+def _cross(c1x,c1y,cdx,cdy,qx,qy):
+    # (cdx,cdy) is the direction of the clipping edge starting at (c1x,c1y).
+    # It is computed once per clipping edge rather than once per vertex. The
+    # point q is inside the clipping polygon if R <= 0
+    return cdx * (qy - c1y) - cdy * (qx - c1x)
+
+@njit(cache=True,fastmath=True,inline='always')
+def _intersect(s1x,s1y,s2x,s2y,r1,r2):
+
+    """
+    given the subject edge from s1 to s2 and the values r1 and r2 of R at s1
+    and s2, compute the point of intersection of the subject edge with the
+    clipping edge. R changes linearly along the subject edge, so the point
+    s1 + t * (s2 - s1) is on the clipping edge when
+
+    t = r1 / (r1 - r2)
+
+    see intersect_soa in SH.py for more details. Since this function is only
+    called if the subject edge crosses the clipping edge, r1 and r2 have
+    different signs, so the denominator is never zero.
+    """
+
+    t = r1 / (r1 - r2)
+
+    return s1x + t * (s2x - s1x), s1y + t * (s2y - s1y)
+
+@njit(cache=True,fastmath=True,inline='always')
+def _clip_edge(src,n_in,clipping_polygon,i,dst):
+
+    # clip the polygon given by the first n_in rows of src against the i-th
+    # edge of the clipping polygon, write the clipped polygon into dst and
+    # return its number of vertices. dst must have at least 2 * n_in rows
+
+    # these two vertices define a line segment (edge) in the clipping
+    # polygon. It is assumed that indices wrap around, such that if
+    # i = 0, then i - 1 = K - 1.
+    c1x = clipping_polygon[i - 1,0]
+    c1y = clipping_polygon[i - 1,1]
+    cdx = clipping_polygon[i,0] - c1x
+    cdy = clipping_polygon[i,1] - c1y
+
+    # the start of the first subject edge is the last vertex. Note that
+    # src[-1] cannot be used here, since only the first n_in rows of
+    # the buffer are valid
+    s1x = src[n_in - 1,0]
+    s1y = src[n_in - 1,1]
+    r1 = _cross(c1x,c1y,cdx,cdy,s1x,s1y)
+
+    n_out = 0
+
+    for j in range(n_in):
+
+        s2x = src[j,0]
+        s2y = src[j,1]
+        r2 = _cross(c1x,c1y,cdx,cdy,s2x,s2y)
+
+        if r2 <= 0:
+            if r1 > 0:
+                x,y = _intersect(s1x,s1y,s2x,s2y,r1,r2)
+                dst[n_out,0] = x
+                dst[n_out,1] = y
+                n_out += 1
+            dst[n_out,0] = s2x
+            dst[n_out,1] = s2y
+            n_out += 1
+        elif r1 <= 0:
+            x,y = _intersect(s1x,s1y,s2x,s2y,r1,r2)
+            dst[n_out,0] = x
+            dst[n_out,1] = y
+            n_out += 1
+
+        # the end of this subject edge is the start of the next one
+        s1x = s2x
+        s1y = s2y
+        r1 = r2
+
+    return n_out
+
+@njit(cache=True,fastmath=True)
+def _clip_into(subject_polygon,clipping_polygon,out):
+
+    # clip the subject polygon, write the clipped polygon into out and return
+    # its number of vertices, or -1 if it does not fit into out
+
+    N = subject_polygon.shape[0]
+    K = clipping_polygon.shape[0]
+
+    # clipping against a single edge at most doubles the number of vertices,
+    # so 2 * max(N,K) is enough for most polygons. The buffers are grown
+    # below if this is not the case
+    cap = 2 * max(N,K) + 4
+    buf_a = np.empty((cap,2),dtype=subject_polygon.dtype)
+    buf_b = np.empty((cap,2),dtype=subject_polygon.dtype)
+
+    buf_a[:N] = subject_polygon
+    n_in = N
+
+    for i in range(K):
+
+        # nothing left to clip
+        if n_in == 0:
+            break
+
+        # the last edge writes the clipped polygon straight into out if out
+        # is guaranteed to be large enough
+        if i == K - 1 and 2 * n_in <= out.shape[0]:
+            return _clip_edge(buf_a,n_in,clipping_polygon,i,out)
+
+        if 2 * n_in > buf_b.shape[0]:
+            buf_b = np.empty((2 * n_in,2),dtype=subject_polygon.dtype)
+
+        # the output of this iteration is the input of the next one
+        n_in = _clip_edge(buf_a,n_in,clipping_polygon,i,buf_b)
+        buf_a,buf_b = buf_b,buf_a
+
+    if n_in > out.shape[0]:
+        return -1
+
+    out[:n_in] = buf_a[:n_in]
+    return n_in
+
+@njit(cache=True,fastmath=True)
+def _clip(subject_polygon,clipping_polygon):
+
+    # clipping against a single edge at most doubles the number of vertices,
+    # so _clip_into can only run out of space for unusual polygons, in which
+    # case out is made larger
+    cap = 2 * (subject_polygon.shape[0] + clipping_polygon.shape[0])
+    while True:
+        out = np.empty((cap,2),dtype=subject_polygon.dtype)
+        n = _clip_into(subject_polygon,clipping_polygon,out)
+        if n >= 0:
+            return out[:n]
+        cap *= 2
+
+@njit(['f4[:,:](f4[:,:],f4[:,:])','f8[:,:](f8[:,:],f8[:,:])'],cache=True,fastmath=True)
+def clip_nb(subject_polygon,clipping_polygon):
+    return _clip(subject_polygon,clipping_polygon)
+
+@njit(parallel=True,cache=True,fastmath=True)
+def clip_batch_nb(verts,offsets,clipping_polygon):
+
+    """
+    clip many subject polygons against the same clipping polygon in parallel.
+    The subject polygons are given as a single M x 2 array verts, where the
+    vertices of the i-th subject polygon are verts[offsets[i]:offsets[i + 1]].
+    The clipped polygons are returned in the same format.
+    """
+
+    n_polygons = offsets.shape[0] - 1
+    K = clipping_polygon.shape[0]
+
+    # each polygon writes its clipped vertices into its own slice of a
+    # preallocated buffer, so no locks are needed. A slice of 2 * (N + K)
+    # rows is enough for most polygons with N vertices
+    out_starts = np.empty(n_polygons + 1,dtype=np.int64)
+    out_starts[0] = 0
+    for i in range(n_polygons):
+        out_starts[i + 1] = out_starts[i] + 2 * (offsets[i + 1] - offsets[i] + K)
+
+    buf = np.empty((out_starts[n_polygons],2),dtype=verts.dtype)
+    counts = np.empty(n_polygons,dtype=np.int64)
+
+    for i in prange(n_polygons):
+        counts[i] = _clip_into(verts[offsets[i]:offsets[i + 1]],clipping_polygon,
+                               buf[out_starts[i]:out_starts[i + 1]])
+
+    # the few clipped polygons that did not fit into their slice are clipped
+    # once more with a large enough output and copied into out_verts below
+    overflow = np.flatnonzero(counts < 0)
+    extra = [_clip(verts[offsets[i]:offsets[i + 1]],clipping_polygon) for i in overflow]
+    for k in range(len(overflow)):
+        counts[overflow[k]] = extra[k].shape[0]
+
+    # pack the clipped polygons into a single array without gaps
+    out_offsets = np.empty(n_polygons + 1,dtype=np.int64)
+    out_offsets[0] = 0
+    for i in range(n_polygons):
+        out_offsets[i + 1] = out_offsets[i] + counts[i]
+
+    out_verts = np.empty((out_offsets[n_polygons],2),dtype=verts.dtype)
+    for i in prange(n_polygons):
+        if counts[i] <= out_starts[i + 1] - out_starts[i]:
+            out_verts[out_offsets[i]:out_offsets[i + 1]] = buf[out_starts[i]:out_starts[i] + counts[i]]
+    for k in range(len(overflow)):
+        i = overflow[k]
+        out_verts[out_offsets[i]:out_offsets[i + 1]] = extra[k]
+
+    return out_verts,out_offsets
+
+class PolygonClipper:
+
+    def __init__(self,warn_if_empty=True,dtype=np.float32):
+        self.warn_if_empty = warn_if_empty
+        
+        # see PolygonClipper.__init__ in SH.py
+        self.dtype = dtype
+
+    def clip(self,subject_polygon,clipping_polygon):
+        # clip_nb is compiled for N x 2 and K x 2 float32 or float64 arrays
+        # only, and both arrays must have the same type
+        subject_polygon = np.asarray(subject_polygon,dtype=self.dtype)
+        clipping_polygon = np.asarray(clipping_polygon,dtype=self.dtype)
+
+        return clip_nb(subject_polygon,clipping_polygon)
+
+    def clip_batch(self,subject_polygons,clipping_polygon):
+        # clip a list of subject polygons against the same clipping polygon
+        # in parallel, and return a list of clipped polygons
+        subject_polygons = [np.asarray(p,dtype=self.dtype).reshape(-1,2) for p in subject_polygons]
+        clipping_polygon = np.asarray(clipping_polygon,dtype=self.dtype)
+
+        offsets = np.zeros(len(subject_polygons) + 1,dtype=np.int64)
+        np.cumsum([len(p) for p in subject_polygons],out=offsets[1:])
+        if subject_polygons:
+            verts = np.concatenate(subject_polygons)
+        else:
+            verts = np.empty((0,2),dtype=self.dtype)
+
+        out_verts,out_offsets = clip_batch_nb(verts,offsets,clipping_polygon)
+
+        return [out_verts[out_offsets[i]:out_offsets[i + 1]] for i in range(len(subject_polygons))]
+
+    def __call__(self,A,B):
+        clipped_polygon = self.clip(A,B)
+        if clipped_polygon.shape[0] == 0 and self.warn_if_empty:
+            warnings.warn(_EMPTY_WARNING,stacklevel=2)
+
+        return clipped_polygon
+
+if __name__ == '__main__':
+
+    clip = PolygonClipper()
+
+    # star and square
+    subject_polygon = [(0,3),(0.5,0.5),(3,0),(0.5,-0.5),(0,-3),(-0.5,-0.5),(-3,0),(-0.5,0.5)]
+    clipping_polygon = [(-2,-2),(-2,2),(2,2),(2,-2)]
+
+    subject_polygon = np.array(subject_polygon)
+    clipping_polygon = np.array(clipping_polygon)
+    clipped_polygon = clip(subject_polygon,clipping_polygon)